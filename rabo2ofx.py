@@ -22,6 +22,12 @@
 #        along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 # 
+# 2026-10-19 agent added machine readable run statistics in json or prometheus format
+# 2026-10-19 agent added option --both to generate GnuCash and HomeBank from one read of the csv
+# 2026-10-19 agent optionally store transactions in sqlite, added query subcommand
+# 2026-10-19 agent validate the csv while reading: columns, header, dates, serial numbers and balance
+# 2026-10-19 agent skip conversion if the csv file and settings did not change since the last run
+# 2026-10-19 agent added rules to rewrite name and memo or set a category, from config or rules file
 # 2021-11-24 guus adding option to override date_posted for processing date in stead of interest date
 #                 adding a simple counter of overrides per account
 # 2019-08-21 guus adding option for homebank to not skip internal transactions
@@ -55,6 +61,54 @@ Find the ofx specification at http://www.ofx.net/
 
 == Documentation ==
 
+[oct 2026] Run statistics:
+With --stats-format json or prometheus the statistics of a run are also written in a machine
+readable form: rows read and skipped, transactions, transfer skips and overrides per target
+and account, rule hits, validation problems, time per stage (hash, parse, render, sqlite)
+and throughput. They go to --stats-file, or to standard output, in which case the normal
+output moves to standard error. The prometheus file is written for a textfile collector.
+
+[oct 2026] Both:
+With --both the csv file is read once and the ofx files for GnuCash (--directory) and
+HomeBank (ofx_hb) are written at the same time, each in its own thread with its own skip
+logic and statistics. The statistics are printed after both writers are done. --both overrides
+--homebank. Both ofx files must differ, so --directory can not be ofx_hb and --outfile
+can not be an absolute path then.
+
+[oct 2026] Sqlite:
+With --sqlite <database> the ofx records are also stored in a sqlite database, in one
+database transaction, replacing records with the same account and fitid. The command
+"rabo2ofx query" searches that database by account, counter account, text in name or
+memo and a date range, and prints the transactions and their total. Amounts are stored
+in cents. The database is filled on every run with --sqlite, also when the ofx is up to
+date. The query opens the database read-only.
+
+[oct 2026] Validation:
+While reading, every row is checked: the number of columns, the header row (no longer
+blindly skipped: a first line with a valid date is processed and reported), the date
+dates, the serial numbers per account (gaps or wrong order) and the balance after each
+transaction against the previous balance plus the amount. The file may be ascending or
+descending; without serial numbers the balances of the first rows decide which. Problems are reported with their
+line number after the statistics. Rows missing a converted column (up to the third
+description) are skipped.
+
+[oct 2026] Cache:
+Every output directory holds a cache ".rabo2ofx.cache" of finished conversions. The key is
+a hash of the csv contents plus the settings that change the ofx (accounts, overrides, rules,
+--homebank, --comma). If the key is known and the ofx still has the size and modification
+time it had after that conversion, the conversion is skipped and the ofx is left untouched. The cache keeps the most recently used entries (--cache-size).
+Use --force to always convert.
+
+[oct 2026] Rules:
+Sections named "[rule <label>]" in the config or in "rules.rabo2ofx.ini" rewrite the NAME
+and MEMO or add a category. A rule matches 'counter' (counter account), 'name' or 'memo'
+on a substring ('contains') or a regex ('regex'), ignoring case. All substring rules are
+compiled once into one matcher per field, so the cost per transaction stays flat with many
+of them; regex rules are combined into one regex that is searched first, and only tried
+one by one when it matches (no inline flags or backreferences). When several rules match the same field, the
+first rule in the config wins. Fields are handled in the order counter, name, memo, so
+name and memo rules see the text as already rewritten by the rules before them.
+
 [nov 2021] On request: 
 created an option to override the date posted with the current date of the transaction.
 Added a counter per account for number of overrides. 
@@ -146,6 +200,16 @@ import argparse
 import datetime
 import os
 import configparser
+import decimal
+import collections
+import hashlib
+import json
+import sqlite3
+import io
+import concurrent.futures
+import contextlib
+import operator
+import time
 
 
 #
@@ -168,15 +232,40 @@ HISTORY = {
     "2.12.1": ("Added minor edits and docs", "2019-08-23", "gbo"),
     "2.13": ("Added OFX booking codes", "2019-08-23", "gbo"),
     "2.14": ("Added override date posted option", "2021-11-24", "gbo"),
+    "2.15": ("Added rules to rewrite name and memo", "2026-10-19", "agent"),
+    "2.16": ("Added cache to skip unchanged conversions", "2026-10-19", "agent"),
+    "2.17": ("Added validation of the csv file", "2026-10-19", "agent"),
+    "2.18": ("Added sqlite database and query subcommand", "2026-10-19", "agent"),
+    "2.19": ("Added option to generate GnuCash and HomeBank in one run", "2026-10-19", "agent"),
+    "2.20": ("Added run statistics in json or prometheus format", "2026-10-19", "agent"),
     }
 
-VERSION = "2.13"
+VERSION = "2.20"
 # Needed for version argument
 VERSION_STRING = '%%(prog)s version %s (%s: [%s] %s)' % (VERSION,
                                                          HISTORY[VERSION][2],
                                                          HISTORY[VERSION][1],
                                                          HISTORY[VERSION][0])
 
+SQLITE_DEFAULT = "rabo2ofx.sqlite"
+
+
+def non_negative_int(value):
+    """ Argument type for numbers that can not be negative """
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("%s is negative" % value)
+    return number
+
+
+def iso_date(value):
+    """ Argument type for dates as yyyy-mm-dd """
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError("%s is not a date (yyyy-mm-dd)" % value)
+
+
 """ First parse the command line arguments. """
 PARSER = argparse.ArgumentParser(prog='rabo2ofx',
                                  description="""
@@ -184,6 +273,10 @@ PARSER = argparse.ArgumentParser(prog='rabo2ofx',
     csv files you can download when logged in to www.rabo.nl as customer of Rabo.
     The intention is to create OFX files for GnuCash (www.gucash.org) or HomeBank.
     Remark: HomeBank gets all transactions. GnuCash skips one side of an internal transfer.
+                                 """,
+                                 epilog="""
+    Transactions stored with --sqlite are searched with "rabo2ofx query", see
+    "rabo2ofx query -h".
                                  """)
 PARSER.add_argument('csvfile', help='A csvfile to process')
 PARSER.add_argument('--outfile', '-o', dest='outfile',
@@ -192,12 +285,53 @@ PARSER.add_argument('--directory','-d', dest='dir',
                     help='Directory to store output, default is ./ofx, ofx_hb for HomeBank', default='ofx')
 PARSER.add_argument('--homebank', '-H', dest='homebank', action='store_true',
                     help='Generate ofx file for HomeBank application')
+PARSER.add_argument('--both', '-b', dest='both', action='store_true',
+                    help='Generate ofx files for both GnuCash (--directory) and HomeBank (ofx_hb), '
+                         'reading the csvfile once. Overrides --homebank')
 PARSER.add_argument('--comma', '-c', dest='dec_comma',
                     help="Convert decimal point to decimal comma, default is decimal_point",
                     action='store_true')
+PARSER.add_argument('--force', '-f', dest='force', action='store_true',
+                    help="Always convert, even if the csvfile and settings did not change")
+PARSER.add_argument('--cache-size', dest='cache_size', type=non_negative_int, default=1000,
+                    help="Number of conversions to remember per output directory, default is 1000")
+PARSER.add_argument('--sqlite', '-s', dest='sqlite', metavar='DATABASE',
+                    help="Also store the transactions in a sqlite database, e.g. "
+                         + SQLITE_DEFAULT, default=None)
+PARSER.add_argument('--stats-format', dest='stats_format', choices=('json', 'prometheus'),
+                    help="Also write the run statistics as json or in prometheus textfile format",
+                    default=None)
+PARSER.add_argument('--stats-file', dest='stats_file', metavar='FILE',
+                    help="File for --stats-format, default is standard output. "
+                         "The normal statistics then go to standard error.", default='-')
 PARSER.add_argument('--version', '-v', action='version',
                     version=VERSION_STRING)
-ARGS = PARSER.parse_args()
+
+""" The query subcommand searches the transactions stored with --sqlite. """
+QUERY_PARSER = argparse.ArgumentParser(prog='rabo2ofx query',
+                                       description="""
+    Search the transactions stored with --sqlite. All conditions must match.
+                                       """)
+QUERY_PARSER.add_argument('--sqlite', '-s', dest='sqlite', default=SQLITE_DEFAULT,
+                          help='The sqlite database, default is ' + SQLITE_DEFAULT)
+QUERY_PARSER.add_argument('--account', '-a', dest='account', default=None,
+                          help='Only transactions of this account')
+QUERY_PARSER.add_argument('--counter', '-t', dest='counter', default=None,
+                          help='Only transactions to or from this counter account')
+QUERY_PARSER.add_argument('--name', '-n', dest='name', default=None,
+                          help='Only transactions with this text in name or memo')
+QUERY_PARSER.add_argument('--from', dest='date_from', type=iso_date, default=None,
+                          help='Only transactions posted on or after this date (yyyy-mm-dd)')
+QUERY_PARSER.add_argument('--to', dest='date_to', type=iso_date, default=None,
+                          help='Only transactions posted on or before this date (yyyy-mm-dd)')
+QUERY_PARSER.set_defaults(query=True)
+
+if sys.argv[1:2] == ['query']:
+    ARGS = QUERY_PARSER.parse_args(sys.argv[2:])
+    if not os.path.isfile(ARGS.sqlite):
+        QUERY_PARSER.error("database " + ARGS.sqlite + " does not exist")
+else:
+    ARGS = PARSER.parse_args()
 
 
 # ********************************************************************************
@@ -257,10 +391,12 @@ class CsvFile():
         "D": "tekort"
     }
 
-    def __init__(self, overrides):
+    def __init__(self, overrides, rules):
         self.transactions = list()
         #transnr = 0
         self.fitid = {}
+        self.rules = rules
+        self.rows_skipped = 0
 
         with open(ARGS.csvfile, 'r', newline='', encoding='iso-8859-1') as csvfile:
             fieldnames = (self.keyAccount, self.keyCurrency, self.keyBIC,
@@ -280,15 +416,20 @@ class CsvFile():
             #Open the csvfile as a Dictreader
             csvreader = csv.DictReader(csvfile, delimiter=',', quotechar='"',
                                        fieldnames=fieldnames)
+            # validate while reading, so the file is read only once
+            self.validator = Validator(len(fieldnames))
             # We have our own fieldnames, so delete the first row containing descriptions
             # Since 1-1-2018 the csv files contain a header row as first line
             linenr = 0
             for row in csvreader:
                 linenr = linenr + 1
-                if linenr == 1:
-                    continue        # skip the first line
+                if linenr == 1 and self.validator.is_header(row, csvreader.line_num):
+                    continue        # skip the header line
                 if not row:
                     continue
+                if not self.validator.check(row, csvreader.line_num):
+                    self.rows_skipped += 1
+                    continue        # too few columns to convert
                 ofx_data = self.create_ofx(row, overrides)
                 self.transactions.append(ofx_data)
 
@@ -464,12 +605,342 @@ class CsvFile():
         elif row[self.keyBookCode] == "ac":
             descr = descr + "betalingskenmerk " + row[self.keyBetalingsKenmerk]
 
+        # rules from config come last, so they can rewrite the results above
+        if self.rules.matchers:
+            (name, descr) = self.rules.apply(row[self.keyCounterAcctNr], name, descr)
+
         memo = descr.replace("&", "&amp")
         return (0, name, memo)
 
 # ************** End Class CsvFile ***********************************************
 # ********************************************************************************
 
+# ********************************************************************************
+# ************** Class Validator   ***********************************************
+class Validator():
+    """ Check the csv rows while they are read and collect gaps and mismatches. """
+
+    date_pattern = re.compile(r"\d{4}-\d{2}-\d{2}$")
+    # maximum number of messages to print, the rest is only counted
+    max_print = 25
+
+    def __init__(self, nr_columns):
+        self.nr_columns = nr_columns
+        self.messages = list()
+        # per account: (serial number, balance, amount, direction) of the previous row
+        self.previous = dict()
+        self.valid_dates = set()
+        # one call fetches all values the common case needs
+        self.getter = operator.itemgetter(CsvFile.keyAccount, CsvFile.keySerialNumber,
+                                          CsvFile.keyAmount, CsvFile.keyBalanceAfterTxn,
+                                          CsvFile.keyDate, CsvFile.keyInterestDate)
+
+    def report(self, linenr, message):
+        """ Register a problem found at linenr """
+        self.messages.append((linenr, message))
+
+    def is_header(self, row, linenr):
+        """ Return True if row is the header row, which has no date in the date column. """
+        if row[CsvFile.keyDate] is not None and self.is_date(row[CsvFile.keyDate]):
+            self.report(linenr, "no header row, the csv layout may have changed. "
+                        "Line is processed as a transaction.")
+            return False
+        return True
+
+    def check(self, row, linenr):
+        """ Check a single row, return False if it has too few columns to convert. """
+        # This runs for every row, so the common case is kept as short as possible.
+        if None in row or row[CsvFile.keyExchangeRate] is None:
+            if not self.check_columns(row, linenr):
+                return False
+        (account, serial, amount, balance, date, interest_date) = self.getter(row)
+
+        # the same dates occur in many rows, so each date is checked only once
+        if date not in self.valid_dates or interest_date not in self.valid_dates:
+            self.check_dates(row, linenr)
+
+        try:
+            serial = int(serial) if serial else None
+            # amounts always have two decimals: compare them as cents
+            amount = int(amount.replace(",", ""))
+            balance = int(balance.replace(",", "")) if balance else None
+        except ValueError:
+            self.report(linenr, "invalid serial number, amount or balance")
+            return True
+
+        previous = self.previous.get(account)
+        if previous is None:
+            self.previous[account] = (serial, balance, amount, 0)
+        elif (serial is not None and serial - 1 == previous[0] and previous[3] >= 0
+              and balance is not None and previous[1] is not None
+              and balance == previous[1] + amount):
+            # next serial number and matching balance
+            self.previous[account] = (serial, balance, amount, 1)
+        else:
+            self.previous[account] = self.check_sequence(account, previous,
+                                                         (serial, balance, amount), linenr)
+        return True
+
+    def check_columns(self, row, linenr):
+        """ Report a wrong number of columns, return False if the row can not be converted. """
+        if None in row:
+            self.report(linenr, "%d columns, expected %d"
+                        % (self.nr_columns + len(row[None]), self.nr_columns))
+            return True
+        nr_columns = len([value for value in row.values() if value is not None])
+        # the columns after the descriptions are not converted
+        if row[CsvFile.keyDescr3] is None:
+            self.report(linenr, "%d columns, expected %d. Line is skipped."
+                        % (nr_columns, self.nr_columns))
+            return False
+        self.report(linenr, "%d columns, expected %d" % (nr_columns, self.nr_columns))
+        return True
+
+    def is_date(self, text):
+        """ Return True if text is an existing date written as yyyy-mm-dd. """
+        # the pattern checks the format, fromisoformat whether the date exists
+        if not self.date_pattern.match(text):
+            return False
+        try:
+            datetime.date.fromisoformat(text)
+        except ValueError:
+            return False
+        return True
+
+    def check_dates(self, row, linenr):
+        """ Check both dates of a row, remember the valid ones. """
+        for key in (CsvFile.keyDate, CsvFile.keyInterestDate):
+            if self.is_date(row[key]):
+                self.valid_dates.add(row[key])
+            else:
+                self.report(linenr, "invalid date '" + row[key] + "' in column " + key)
+
+    def check_sequence(self, account, previous, current, linenr):
+        """ Check serial number and balance against the previous row of the account,
+        return the new previous row. """
+        (prev_serial, prev_balance, prev_amount, direction) = previous
+        (serial, balance, amount) = current
+
+        # the file may list transactions in ascending or descending order,
+        # the first two transactions of an account decide which.
+        in_sequence = True
+        if serial is not None and prev_serial is not None:
+            if direction == 0:
+                direction = 1 if serial > prev_serial else -1
+            if serial != prev_serial + direction:
+                in_sequence = False
+                first_missing = min(serial, prev_serial) + 1
+                last_missing = max(serial, prev_serial) - 1
+                if (serial - prev_serial) * direction > 1 and first_missing == last_missing:
+                    self.report(linenr, "%s: serial number %d is missing"
+                                % (account, first_missing))
+                elif (serial - prev_serial) * direction > 1:
+                    self.report(linenr, "%s: serial numbers %d to %d are missing"
+                                % (account, first_missing, last_missing))
+                else:
+                    self.report(linenr, "%s: serial number %d follows %d"
+                                % (account, serial, prev_serial))
+
+        # after a gap the balance can not be checked
+        if in_sequence and balance is not None and prev_balance is not None:
+            if direction == 0:
+                # without serial numbers the balances decide the order: the direction
+                # stays unknown while both orders fit (an amount of 0) or neither does
+                ascending = balance == prev_balance + amount
+                descending = prev_balance == balance + prev_amount
+                if ascending != descending:
+                    direction = 1 if ascending else -1
+            if direction >= 0:
+                expected = prev_balance + amount
+                actual = balance
+            else:
+                expected = balance + prev_amount
+                actual = prev_balance
+            if expected != actual:
+                self.report(linenr, "%s: balance %s does not match previous balance and amount (%s)"
+                            % (account, cents(actual), cents(expected)))
+
+        return (serial, balance, amount, direction)
+
+
+def cents(amount):
+    """ Return an amount in cents as a string with two decimals. """
+    return str(decimal.Decimal(amount).scaleb(-2))
+
+# ************** End Class Validator ***********************************************
+# ********************************************************************************
+
+# ********************************************************************************
+# ************** Class Rules       ***********************************************
+class Rules():
+    """ Rewrite rules for name and memo, substring rules compiled into one matcher per field. """
+
+    # fields a rule can match against and fields a rule can set
+    fields = ('counter', 'name', 'memo')
+    actions = ('name', 'memo', 'category')
+    # what a name or memo template may contain besides plain text
+    template_pattern = re.compile(r"%%|%\((?:counter|name|memo)\)s")
+    # constructs that change meaning or fail once a regex is part of the combined regex:
+    # global inline flags like (?i) and backreferences like \1, (?P=name) or (?(1)...)
+    combine_pattern = re.compile(r"\(\?[aiLmsux]+\)|(?<!\\)(?:\\\\)*\\[1-9]|\(\?P=|\(\?\(")
+
+    def __init__(self):
+        self.rules = list()
+        self.hits = list()
+        # per field: (literal matcher, literal -> first rule,
+        #             combined regex, [(rule index, regex)])
+        self.matchers = dict()
+
+    def add_section(self, section):
+        """ Add the rule described by a config section, e.g. [rule albert heijn]. """
+        label = section.name[len('rule '):].strip()
+        field = section.get('field', 'memo', raw=True).strip().lower()
+        contains = section.get('contains', None, raw=True)
+        regex = section.get('regex', None, raw=True)
+        if field not in self.fields:
+            print("warning: rule '" + label + "' has unknown field '" + field + "', ignored.")
+            return
+        if bool(contains) == bool(regex):
+            print("warning: rule '" + label + "' needs either 'contains' or 'regex', ignored.")
+            return
+        if regex:
+            try:
+                re.compile(regex, re.IGNORECASE)
+            except re.error as err:
+                print("warning: rule '" + label + "' has an invalid regex (" + str(err) + "), ignored.")
+                return
+            if self.combine_pattern.search(regex):
+                print("warning: rule '" + label + "' uses inline flags like (?i) or backreferences"
+                      + " in its regex, ignored.")
+                return
+        actions = dict()
+        for action in self.actions:
+            if action in section:
+                actions[action] = section.get(action, raw=True)
+        for action in ('name', 'memo'):
+            if action in actions and "%" in self.template_pattern.sub("", actions[action]):
+                print("warning: rule '" + label + "' has an invalid " + action + " '"
+                      + actions[action] + "' (use %% for a percent sign), ignored.")
+                return
+        self.rules.append({'label': label, 'field': field,
+                           'contains': contains and contains.lower(), 'regex': regex,
+                           'actions': actions})
+        self.hits.append(0)
+
+    def compile(self):
+        """ Compile all literal rules for a field into one trie regex, and the regex rules
+        into one combined regex and each on its own. """
+        # Python's re backtracks through an alternation one branch at a time, so hundreds
+        # of plain alternatives get slow. Literals are therefore merged into a trie first:
+        # every character is then examined once, no matter how many literals there are.
+        for field in self.fields:
+            literals = dict()
+            regexes = list()
+            for nr, rule in enumerate(self.rules):
+                if rule['field'] != field:
+                    continue
+                if rule['contains']:
+                    # first rule wins for duplicate literals
+                    literals.setdefault(rule['contains'], nr)
+                else:
+                    regexes.append((nr, re.compile(rule['regex'], re.IGNORECASE)))
+            literal_matcher = None
+            first_rule = dict()
+            if literals:
+                # The lookahead finds the longest literal at every position, also where
+                # matches overlap. Shorter literals at the same position are prefixes of
+                # that one, so remember the first rule among a literal and its prefixes.
+                literal_matcher = re.compile("(?=(" + trie_pattern(literals) + "))")
+                for literal in literals:
+                    first_rule[literal] = min(literals[literal[:end]]
+                                              for end in range(1, len(literal) + 1)
+                                              if literal[:end] in literals)
+            # Most texts match none of the regex rules: one search of the combined regex
+            # tells, only a match needs the rules one by one to find the first.
+            combined = None
+            if regexes:
+                try:
+                    combined = re.compile("|".join("(?:" + regex.pattern + ")"
+                                                   for (nr, regex) in regexes), re.IGNORECASE)
+                except re.error as err:
+                    # e.g. the same group name in two rules, the rules are then tried one by one
+                    print("warning: the regex rules for " + field + " can not be combined ("
+                          + str(err) + "), they are slower.")
+            if literal_matcher or regexes:
+                self.matchers[field] = (literal_matcher, first_rule, combined, regexes)
+
+    def match(self, field, text):
+        """ Return the index of the first rule in config order matching text or None. """
+        (literal_matcher, first_rule, combined, regexes) = self.matchers[field]
+        found = None
+        if literal_matcher:
+            for match in literal_matcher.finditer(text.lower()):
+                nr = first_rule[match.group(1)]
+                if found is None or nr < found:
+                    found = nr
+        if combined and not combined.search(text):
+            return found
+        # regex rules are tried one by one, only those before the literal rule found
+        for (nr, regex) in regexes:
+            if found is not None and nr > found:
+                break
+            if regex.search(text):
+                found = nr
+                break
+        return found
+
+    def apply(self, counter, name, memo):
+        """ Apply the first matching rule per field, return (name, memo) """
+        # The fields are matched in order counter, name, memo: a name or memo rule
+        # sees the text as already rewritten by the rules before it.
+        values = {'counter': counter, 'name': name, 'memo': memo}
+        for field in self.fields:
+            if field not in self.matchers:
+                continue
+            nr = self.match(field, values[field])
+            if nr is None:
+                continue
+            self.hits[nr] += 1
+            actions = self.rules[nr]['actions']
+            # templates may refer to the values before this rule: %(name)s, %(memo)s, %(counter)s
+            original = dict(values)
+            if 'name' in actions:
+                values['name'] = actions['name'] % original
+            if 'memo' in actions:
+                values['memo'] = actions['memo'] % original
+            if 'category' in actions:
+                values['memo'] = "[" + actions['category'] + "] " + values['memo']
+        return (values['name'], values['memo'])
+
+
+def trie_pattern(literals):
+    """ Construct a regex pattern matching any of the literals, sharing common prefixes. """
+    trie = dict()
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, dict())
+        node[''] = None             # end of a literal
+
+    def construct(node):
+        alternatives = [re.escape(char) + construct(node[char])
+                        for char in sorted(node) if char]
+        if not alternatives:
+            return ""
+        if len(alternatives) == 1:
+            pattern = alternatives[0]
+        else:
+            pattern = "(?:" + "|".join(alternatives) + ")"
+        if '' in node:
+            # a shorter literal ends here, the longer ones are optional
+            pattern = "(?:" + pattern + ")?"
+        return pattern
+
+    return construct(trie)
+
+# ************** End Class Rules   ***********************************************
+# ********************************************************************************
+
 # ********************************************************************************
 # ************** Class Cfg         ***********************************************
 class Cfg():
@@ -479,8 +950,10 @@ class Cfg():
         config = configparser.ConfigParser()
         # use default filename for now
         configfile = "config.rabo2ofx.ini"
+        rulesfile = "rules.rabo2ofx.ini"
         self.config_accounts = list()
         self.config_overrides = dict()
+        self.rules = Rules()
         if os.path.exists(os.path.join(os.getcwd(), configfile)):
             config.read(configfile)
             config.sections()
@@ -491,7 +964,19 @@ class Cfg():
 ##            if 'override' in config:
             for key in config['override']:
                 self.config_overrides[key] = config['override'][key]
-
+            self.read_rules(config)
+        # rules may also live in a separate file, read after the rules in config
+        if os.path.exists(os.path.join(os.getcwd(), rulesfile)):
+            rules_config = configparser.ConfigParser(interpolation=None)
+            rules_config.read(rulesfile)
+            self.read_rules(rules_config)
+        self.rules.compile()
+
+    def read_rules(self, config):
+        """ Add all sections named [rule <label>] as rules, in order of appearance """
+        for section in config.sections():
+            if section.startswith('rule '):
+                self.rules.add_section(config[section])
 
     def run(self):
         """ dummy run section for config class """
@@ -535,14 +1020,17 @@ class OfxWriter():
 
     date = datetime.date.today()
     nowdate = str(date.strftime("%Y%m%d"))
-    processed_accounts = set()
+    processed_accounts = None
     cfg = None
     csv = None
+    homebank = False
+    accounts = None
+    elapsed = 0.0
     filename = None
     filepath = None
     dir = None
 
-    def __init__(self, cfg):
+    def __init__(self, cfg, homebank):
         #create path to ofxfile
         if ARGS.outfile:
             self.filename = ARGS.outfile
@@ -553,8 +1041,11 @@ class OfxWriter():
         if not isinstance(cfg, Cfg):
             print ("cfg is not an instance of Cfg")
         self.cfg = cfg
+        self.homebank = homebank
+        # every writer has its own skip logic, so it remembers its own accounts
+        self.processed_accounts = set()
 
-        if ARGS.homebank:
+        if homebank:
             dir = 'ofx_hb'
         else:
             dir = ARGS.dir
@@ -566,26 +1057,28 @@ class OfxWriter():
 
         self.filepath = os.path.join(os.getcwd(), dir, self.filename)
 
-        #Initiate a csv object with data in list of dictionaries.
-        self.csv = CsvFile(cfg.config_overrides)
+    def run(self, csv, out=None):
+        """ Run the generation of ofx records from the csv, print statistics to out. """
+        # The csv is only read, so several writers can run on it at the same time.
+        started = time.perf_counter()
+        self.csv = csv
+        out = out or sys.stdout
 
-    def run(self):
-        """ Run the generation of ofx records. """
         #Determine unique accounts and start and end dates
         mindate = 999999999
         maxdate = 0
 
-        if ARGS.homebank:
+        if self.homebank:
             version_type = 'HomeBank'
         else:
             version_type = 'GnuCash'
 
         # print some statistics:
-        print("           Output to " + self.dir + " (" + version_type + " version)" )
+        print("           Output to " + self.dir + " (" + version_type + " version)", file=out)
         print
-        print("TRANSACTIONS: " + str(len(self.csv.transactions)))
-        print("IN:           " + ARGS.csvfile)
-        print("OUT:          " + self.filename)
+        print("TRANSACTIONS: " + str(len(self.csv.transactions)), file=out)
+        print("IN:           " + ARGS.csvfile, file=out)
+        print("OUT:          " + self.filename, file=out)
         print
 
         accounts = dict()
@@ -607,6 +1100,8 @@ class OfxWriter():
                 maxdate = int(trns['dtposted'])
 
         ctr_accounts_processed = len(accounts)
+        # keep the counters for the run statistics
+        self.accounts = accounts
 
         ctr_txns_processed = 0;
         ctr_txns_skipped_transfer = 0;
@@ -631,7 +1126,7 @@ class OfxWriter():
                         message_transaction = construct_txn(trns)
                         accounts[account]['txn_ctr'] += 1
                         # guard against processing transfer between accounts twice for GnuCash
-                        if trns['accountto'] in transfer_accounts and not ARGS.homebank:
+                        if trns['accountto'] in transfer_accounts and not self.homebank:
                             accounts[account]['txn_skip'] += 1
                             # ignore nr_overrides
                         else:
@@ -648,27 +1143,45 @@ class OfxWriter():
             ofxfile.write(message_footer)
 
             # Check accounts processed versus found accounts
-            print("\taccountnumber     processed  skip   sum   overrides")
+            print("\taccountnumber     processed  skip   sum   overrides", file=out)
             for account in accounts:
-                sys.stdout.write('\t%s '% account)      # prevent '\n'
-                print("%(txn_processed)8d %(txn_skip)5d %(txn_ctr)5d %(nr_overrides)11d"%accounts[account] )
-            print ("\t-")
+                out.write('\t%s '% account)      # prevent '\n'
+                print("%(txn_processed)8d %(txn_skip)5d %(txn_ctr)5d %(nr_overrides)11d"%accounts[account],
+                      file=out)
+            print ("\t-", file=out)
             if len(self.processed_accounts) > len(self.cfg.config_accounts):
-                print("warning: it seems you have more accounts in your file(s)")
-                print("         than in your config.")
-                print("         This carries the risk of double transfers if you use GnuCash.")
-                print("")
-                print("         Add all accounts you download to your")
-                print("         config file and rerun the program.")
-                print("         There is an example config in this directory.")
-                print("         You can find the accounts processed in the stats above.")
+                print("warning: it seems you have more accounts in your file(s)", file=out)
+                print("         than in your config.", file=out)
+                print("         This carries the risk of double transfers if you use GnuCash.", file=out)
+                print("", file=out)
+                print("         Add all accounts you download to your", file=out)
+                print("         config file and rerun the program.", file=out)
+                print("         There is an example config in this directory.", file=out)
+                print("         You can find the accounts processed in the stats above.", file=out)
                 print
-                print("         The config file is called 'config.rabo2ofx.ini'.")
-                print("")
-            if self.cfg.config_overrides:
-                print("---- overrides        -----")
-                for key in self.cfg.config_overrides:
-                    print(key + " = " + self.cfg.config_overrides[key])
+                print("         The config file is called 'config.rabo2ofx.ini'.", file=out)
+                print("", file=out)
+        self.elapsed = time.perf_counter() - started
+
+    def report(self, out=None):
+        """ Print overrides, rules and validation, which are the same for every writer. """
+        out = out or sys.stdout
+        if self.cfg.config_overrides:
+            print("---- overrides        -----", file=out)
+            for key in self.cfg.config_overrides:
+                print(key + " = " + self.cfg.config_overrides[key], file=out)
+        if self.cfg.rules.rules:
+            print("---- rules            -----", file=out)
+            print("\trule                            hits", file=out)
+            for (rule, hits) in zip(self.cfg.rules.rules, self.cfg.rules.hits):
+                print("\t%-28s %7d" % (rule['label'], hits), file=out)
+        messages = self.csv.validator.messages
+        if messages:
+            print("---- validation       -----", file=out)
+            for (linenr, message) in messages[:Validator.max_print]:
+                print("\tline %6d: %s" % (linenr, message), file=out)
+            if len(messages) > Validator.max_print:
+                print("\t... and %d more" % (len(messages) - Validator.max_print), file=out)
 
     def gather_transfer_accounts(self, account):
         """ Make sure all main accounts in config or already processed are
@@ -687,6 +1200,347 @@ class OfxWriter():
 
 # ************** End Class OfxWriter ***********************************************
 
+# ********************************************************************************
+# ************** Class ResultCache ***********************************************
+class ResultCache():
+    """ Remember finished conversions by content hash, so unchanged files are skipped. """
+
+    cachefile = ".rabo2ofx.cache"
+
+    def __init__(self, dir, size):
+        # the cache lives next to the ofx files it describes
+        self.filepath = os.path.join(os.getcwd(), dir, self.cachefile)
+        self.size = size
+        # key -> [ofx filepath, size, mtime in ns], least recently used first
+        self.entries = collections.OrderedDict()
+        if os.path.exists(self.filepath):
+            try:
+                with open(self.filepath, 'r') as cachefile:
+                    self.entries.update(json.load(cachefile))
+            except (OSError, ValueError):
+                # a damaged cache only costs a conversion
+                print("warning: ignoring unreadable cache " + self.filepath)
+                self.entries.clear()
+
+    def key(self, csvdigest, cfg, homebank):
+        """ Return the hash of the csv contents and all settings that change the ofx. """
+        digest = hashlib.sha256(csvdigest.encode('ascii'))
+        settings = {'version': VERSION,
+                    'accounts': cfg.config_accounts,
+                    'overrides': cfg.config_overrides,
+                    'rules': cfg.rules.rules,
+                    'homebank': homebank,
+                    'dec_comma': ARGS.dec_comma}
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def hit(self, key, ofxpath):
+        """ Return True if key was converted to ofxpath before and the ofx is unchanged since. """
+        # another target, directory or program may have overwritten the ofx
+        entry = self.entries.get(key)
+        if entry is None or entry != ofx_entry(ofxpath):
+            return False
+        self.entries.move_to_end(key)
+        return True
+
+    def store(self, key, ofxpath):
+        """ Register a finished conversion, evicting the least recently used entries. """
+        # the ofx was overwritten, so older conversions to the same file are gone
+        for old_key in [k for k in self.entries if self.entries[k][0] == ofxpath]:
+            del self.entries[old_key]
+        self.entries[key] = ofx_entry(ofxpath)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """ Write the cache, replacing the old one in one step. """
+        tmppath = self.filepath + ".tmp"
+        with open(tmppath, 'w') as cachefile:
+            json.dump(self.entries, cachefile, indent=0)
+        os.replace(tmppath, self.filepath)
+
+
+
+def ofx_entry(ofxpath):
+    """ Return the cache entry of ofxpath as it is now, None if it does not exist. """
+    try:
+        stat = os.stat(ofxpath)
+    except OSError:
+        return None
+    return [ofxpath, stat.st_size, stat.st_mtime_ns]
+
+
+def csv_digest(csvfilename):
+    """ Return the sha256 of the contents of the csv file. """
+    digest = hashlib.sha256()
+    with open(csvfilename, 'rb') as csvfile:
+        for block in iter(lambda: csvfile.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# ************** End Class ResultCache ***********************************************
+
+# ********************************************************************************
+# ************** Class SqliteWriter ***********************************************
+class SqliteWriter():
+    """ Store the ofx records in a sqlite database, so they can be queried later. """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            account     TEXT NOT NULL,
+            fitid       TEXT NOT NULL,
+            trntype     TEXT,
+            dtposted    TEXT,           -- yyyymmdd
+            trnamt      INTEGER,        -- amount in cents
+            name        TEXT,
+            accountto   TEXT,
+            memo        TEXT,
+            csvfile     TEXT,
+            UNIQUE (account, fitid));
+        """
+    # the unique constraint doubles as the index on account
+    indexes = {
+        "transactions_dtposted": "transactions (dtposted)",
+        "transactions_accountto": "transactions (accountto)",
+        "transactions_fitid": "transactions (fitid)",
+        }
+
+    def __init__(self, filename, readonly=False):
+        self.filepath = os.path.join(os.getcwd(), filename)
+        if readonly:
+            # a mistyped name must not silently create an empty database
+            # only the query needs pathlib, it is not worth its import time on every run
+            import pathlib
+            uri = pathlib.Path(self.filepath).as_uri() + "?mode=ro"
+            self.connection = sqlite3.connect(uri, uri=True)
+        else:
+            self.connection = sqlite3.connect(self.filepath)
+            self.connection.executescript(self.schema)
+            self.create_indexes()
+
+    def create_indexes(self):
+        """ Create the indexes used by query. """
+        for (index, columns) in self.indexes.items():
+            self.connection.execute("CREATE INDEX IF NOT EXISTS " + index + " ON " + columns)
+
+    def drop_indexes(self):
+        """ Drop the indexes used by query. """
+        for index in self.indexes:
+            self.connection.execute("DROP INDEX IF EXISTS " + index)
+
+    def store(self, transactions, csvfile):
+        """ Insert or replace all transactions in one database transaction. """
+        # A converted file may be converted again, the fitid then identifies the transaction.
+        rows = ((trns['account'], trns['fitid'], trns['trntype'], trns['dtposted'],
+                 to_cents(trns['trnamt']), trns['name'], trns['accountto'],
+                 trns['memo'], csvfile)
+                for trns in transactions)
+        with self.connection:
+            # sqlite3 only opens a transaction by itself before the insert, so without
+            # an explicit BEGIN the indexes would be dropped outside of it
+            self.connection.execute("BEGIN")
+            # Building an index afterwards is about twice as fast as updating it for every
+            # row, but only worth it if the table grows by more than its current size.
+            existing = self.connection.execute("SELECT count(*) FROM transactions").fetchone()[0]
+            rebuild = len(transactions) > existing
+            if rebuild:
+                self.drop_indexes()
+            self.connection.executemany("""
+                INSERT OR REPLACE INTO transactions
+                    (account, fitid, trntype, dtposted, trnamt, name, accountto, memo, csvfile)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+            if rebuild:
+                self.create_indexes()
+
+    def query(self, account=None, counter=None, name=None, date_from=None, date_to=None):
+        """ Return the transactions matching all given conditions, ordered by date. """
+        conditions = list()
+        parameters = list()
+        if account:
+            conditions.append("account = ?")
+            parameters.append(account.replace(" ", "").upper())
+        if counter:
+            conditions.append("accountto = ?")
+            parameters.append(counter.replace(" ", "").upper())
+        if name:
+            conditions.append("(name LIKE ? OR memo LIKE ?)")
+            parameters.extend(["%" + name + "%"] * 2)
+        if date_from:
+            conditions.append("dtposted >= ?")
+            parameters.append(date_from.replace("-", ""))
+        if date_to:
+            conditions.append("dtposted <= ?")
+            parameters.append(date_to.replace("-", ""))
+        sql = "SELECT dtposted, account, trnamt, accountto, name, memo FROM transactions"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY dtposted, account, fitid"
+        return self.connection.execute(sql, parameters).fetchall()
+
+    def run_query(self):
+        """ Print the transactions requested on the command line and their total. """
+        transactions = self.query(ARGS.account, ARGS.counter, ARGS.name,
+                                  ARGS.date_from, ARGS.date_to)
+        total = 0
+        for (dtposted, account, trnamt, accountto, name, memo) in transactions:
+            print("%s %s %12s %-18s %s | %s" % (dtposted, account, cents(trnamt),
+                                                accountto, name, memo))
+            total += trnamt
+        print("\t-")
+        print("TRANSACTIONS: " + str(len(transactions)))
+        print("TOTAL:        " + cents(total))
+
+    def close(self):
+        """ Close the database """
+        self.connection.close()
+
+
+def to_cents(trnamt):
+    """ Convert a mapped amount with decimal point or comma to an integer in cents. """
+    return int(decimal.Decimal(trnamt.replace(",", ".")).scaleb(2))
+
+# ************** End Class SqliteWriter ***********************************************
+
+# ********************************************************************************
+# ************** Class RunStats    ***********************************************
+class RunStats():
+    """ Machine readable statistics of a run, written with --stats-format. """
+
+    # The counters per account are the ones OfxWriter keeps for its table anyway,
+    # so the only extra cost of a run is a few clock readings per stage.
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timestamp = time.time()
+        self.stages = collections.OrderedDict()
+        self.csv = None
+        self.cfg = None
+        self.targets = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """ Measure the elapsed time of the statements in a with block """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def add_target(self, writer, converted):
+        """ Register an ofx writer, converted is False if the cache made it unnecessary """
+        self.targets[writer] = converted
+
+    def as_dict(self):
+        """ Return all statistics as a dict, ready for json """
+        elapsed = time.perf_counter() - self.started
+        rows_read = 0
+        rows_skipped = 0
+        validation = 0
+        if self.csv:
+            rows_read = len(self.csv.transactions) + self.csv.rows_skipped
+            rows_skipped = self.csv.rows_skipped
+            validation = len(self.csv.validator.messages)
+        stats = {'version': VERSION,
+                 'csvfile': ARGS.csvfile,
+                 'timestamp': self.timestamp,
+                 'elapsed': elapsed,
+                 'rows_read': rows_read,
+                 'rows_skipped': rows_skipped,
+                 'rows_per_second': rows_read / elapsed if elapsed else 0.0,
+                 'validation_problems': validation,
+                 'stages': dict(self.stages),
+                 'targets': dict()}
+        if self.csv and self.stages.get('parse'):
+            stats['parse_rows_per_second'] = rows_read / self.stages['parse']
+        if self.cfg and self.cfg.rules.rules:
+            stats['rules'] = dict((rule['label'], hits) for (rule, hits)
+                                  in zip(self.cfg.rules.rules, self.cfg.rules.hits))
+        for (writer, converted) in self.targets.items():
+            target = {'directory': writer.dir,
+                      'ofxfile': writer.filename,
+                      'converted': converted,
+                      'elapsed': writer.elapsed,
+                      'accounts': dict()}
+            for (account, counters) in (writer.accounts or dict()).items():
+                target['accounts'][account] = {'rows': counters['txn_ctr'],
+                                               'processed': counters['txn_processed'],
+                                               'transfer_skips': counters['txn_skip'],
+                                               'overrides': counters['nr_overrides']}
+            stats['targets']['homebank' if writer.homebank else 'gnucash'] = target
+        return stats
+
+    def to_json(self):
+        """ Return the statistics as a json document """
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True) + "\n"
+
+    def to_prometheus(self):
+        """ Return the statistics in the prometheus text exposition format """
+        stats = self.as_dict()
+        csvfile = {'csvfile': stats['csvfile']}
+        lines = list()
+
+        def metric(name, help_text, samples):
+            lines.append("# HELP rabo2ofx_%s %s" % (name, help_text))
+            lines.append("# TYPE rabo2ofx_%s gauge" % name)
+            for (labels, value) in samples:
+                labels = dict(csvfile, **labels)
+                label_text = ",".join('%s="%s"' % (key, prometheus_escape(labels[key]))
+                                      for key in sorted(labels))
+                lines.append("rabo2ofx_%s{%s} %s" % (name, label_text, repr(float(value))))
+
+        metric("last_run_timestamp_seconds", "Time the run started.",
+               [({}, stats['timestamp'])])
+        metric("elapsed_seconds", "Duration of the run.", [({}, stats['elapsed'])])
+        metric("stage_seconds", "Duration per stage of the run.",
+               [({'stage': stage}, seconds) for (stage, seconds) in sorted(stats['stages'].items())])
+        metric("rows_read", "Csv rows read.", [({}, stats['rows_read'])])
+        metric("rows_skipped", "Csv rows skipped for too few columns.",
+               [({}, stats['rows_skipped'])])
+        metric("rows_per_second", "Rows read per second of the whole run.",
+               [({}, stats['rows_per_second'])])
+        metric("validation_problems", "Problems found while validating the csv.",
+               [({}, stats['validation_problems'])])
+        metric("rule_hits", "Transactions changed per rule.",
+               [({'rule': rule}, hits) for (rule, hits) in sorted(stats.get('rules', {}).items())])
+        metric("converted", "1 if the ofx was written, 0 if it was up to date.",
+               [({'target': target}, values['converted'])
+                for (target, values) in sorted(stats['targets'].items())])
+        for (name, key, help_text) in (("account_rows", 'rows', "Transactions per account."),
+                                       ("account_processed", 'processed',
+                                        "Transactions written per account."),
+                                       ("account_transfer_skips", 'transfer_skips',
+                                        "Transfers skipped per account."),
+                                       ("account_overrides", 'overrides',
+                                        "Overrides per account.")):
+            metric(name, help_text,
+                   [({'target': target, 'account': account}, counters[key])
+                    for (target, values) in sorted(stats['targets'].items())
+                    for (account, counters) in sorted(values['accounts'].items())])
+        return "\n".join(lines) + "\n"
+
+    def write(self, stats_format, filename):
+        """ Write the statistics to filename, '-' is standard output """
+        if stats_format == 'prometheus':
+            text = self.to_prometheus()
+        else:
+            text = self.to_json()
+        if filename == '-':
+            sys.stdout.write(text)
+            return
+        # replace in one step, a textfile collector must never read half a file
+        tmppath = filename + ".tmp"
+        with open(tmppath, 'w') as statsfile:
+            statsfile.write(text)
+        os.replace(tmppath, filename)
+
+
+def prometheus_escape(value):
+    """ Escape a label value for the prometheus text format. """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# ************** End Class RunStats ***********************************************
+
 def construct_message_header(date):
     """ Construct and return the starting message for the file. """
     message_header = """
@@ -775,7 +1629,80 @@ def construct_txn(trns):
 
 
 if __name__ == "__main__":
-    # Cfg will have empty list if there is no config file
-    cfg = Cfg()
-    OFX = OfxWriter(cfg)
-    OFX.run()
+    if getattr(ARGS, 'query', False):
+        DB = SqliteWriter(ARGS.sqlite, readonly=True)
+        DB.run_query()
+        DB.close()
+        sys.exit(0)
+
+    # With statistics on standard output, the normal output moves to standard error.
+    STATS = RunStats()
+    if ARGS.stats_format and ARGS.stats_file == '-':
+        report_out = sys.stderr
+    else:
+        report_out = sys.stdout
+    with contextlib.redirect_stdout(report_out):
+        # Cfg will have empty list if there is no config file
+        cfg = Cfg()
+        STATS.cfg = cfg
+        if ARGS.both:
+            targets = [False, True]         # GnuCash and HomeBank
+        else:
+            targets = [ARGS.homebank]
+
+        # find the targets that need a conversion
+        with STATS.stage('hash'):
+            digest = csv_digest(ARGS.csvfile)
+        writers = [OfxWriter(cfg, homebank) for homebank in targets]
+        # two threads writing one file leave only the output of the last one
+        if len(set(os.path.realpath(OFX.filepath) for OFX in writers)) < len(writers):
+            PARSER.error("--both writes GnuCash and HomeBank to the same file "
+                         + writers[0].filepath + ", change --directory or --outfile")
+        caches = list()
+        pending = list()
+        for (homebank, OFX) in zip(targets, writers):
+            cache = ResultCache(OFX.dir, ARGS.cache_size)
+            key = cache.key(digest, cfg, homebank)
+            caches.append(cache)
+            if not ARGS.force and cache.hit(key, OFX.filepath):
+                # leave the ofx file alone, so its mtime does not trigger a new import
+                print("UNCHANGED:    " + ARGS.csvfile + " (" + OFX.filepath + " is up to date)")
+                STATS.add_target(OFX, False)
+            else:
+                pending.append((OFX, cache, key))
+                STATS.add_target(OFX, True)
+
+        # The database may have been removed or rebuilt since the ofx was written,
+        # so with --sqlite the csv is always read and stored, even if the ofx is up to date.
+        if pending or ARGS.sqlite:
+            # read the csv once for all targets
+            with STATS.stage('parse'):
+                CSV = CsvFile(cfg.config_overrides, cfg.rules)
+            STATS.csv = CSV
+        if pending:
+            with STATS.stage('render'):
+                if len(pending) == 1:
+                    pending[0][0].run(CSV)
+                else:
+                    # each writer prints to its own buffer, so the statistics do not get mixed up
+                    outputs = [io.StringIO() for target in pending]
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                        futures = [executor.submit(OFX.run, CSV, out)
+                                   for ((OFX, cache, key), out) in zip(pending, outputs)]
+                    for (future, out) in zip(futures, outputs):
+                        future.result()         # raises any error of the writer
+                        sys.stdout.write(out.getvalue())
+            pending[0][0].report()
+        if ARGS.sqlite:
+            with STATS.stage('sqlite'):
+                DB = SqliteWriter(ARGS.sqlite)
+                DB.store(CSV.transactions, ARGS.csvfile)
+                DB.close()
+        for (OFX, cache, key) in pending:
+            cache.store(key, OFX.filepath)
+
+        for cache in caches:
+            cache.save()
+
+    if ARGS.stats_format:
+        STATS.write(ARGS.stats_format, ARGS.stats_file)